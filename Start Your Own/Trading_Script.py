@@ -9,33 +9,69 @@ Trading_Script.py — self-contained daily scanner that outputs BUY signals.
 - Entry: 20-day breakout AND price > 50-SMA AND RSI(14) in [50,70]
 - Stop: entry - 2*ATR(14)
 - Target: ~2R (entry + 4*ATR)
-- Output: buy_signals.csv and signals.csv with identical BUY rows (or header-only if none)
+- Output: buy_signals.csv and signals.csv with identical BUY rows (or header-only if none),
+  plus a per-day history shard signals/YYYY-MM-DD.csv
 
 Env overrides (optional):
-  ACCOUNT_EQUITY, RISK_PCT, MAX_POS_PCT, MIN_PRICE, MIN_ADV_USD, UNIVERSE
+  ACCOUNT_EQUITY, RISK_PCT, MAX_POS_PCT, MIN_PRICE, MIN_ADV_USD, UNIVERSE,
+  OHLCV_CACHE_DIR (daily bars cached as parquet; default .cache/ohlcv),
+  SIGNALS_DIR (daily signal history shards; default signals/),
+  YF_HTTP_CACHE (false = no local HTTP cache), YF_CACHE_TTL (seconds, default 900)
 """
 
-import os, sys, math, warnings
+import csv, glob, os, sys, math, warnings
 warnings.filterwarnings("ignore")
 
 import numpy as np
 import pandas as pd
+
+# Cache Yahoo HTTP responses locally so quick reruns skip the network; must run before yfinance
+# creates its session. Set YF_HTTP_CACHE=false to disable (e.g. in CI).
+if os.getenv("YF_HTTP_CACHE", "true").lower() == "true":
+    try:
+        import requests_cache
+        requests_cache.install_cache(os.path.expanduser(os.path.join("~", ".cache", "yf_cache")),
+                                     expire_after=int(os.getenv("YF_CACHE_TTL", "900")))
+    except ImportError:
+        pass
+
 import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 from datetime import datetime, timezone
 
+try:
+    from numba import njit
+except ImportError:  # plain-Python fallback; same results, just slower
+    def njit(*args, **kwargs):
+        return lambda f: f
+
 # ---------- Configuration ----------
 TODAY = datetime.now(timezone.utc).date().isoformat()
 
 EQUITY      = float(os.getenv("ACCOUNT_EQUITY", "2000"))
 RISK_PCT    = float(os.getenv("RISK_PCT", "0.01"))       # 1% risk = $20 on $2k
 MAX_POS_PCT = float(os.getenv("MAX_POS_PCT", "0.25"))    # 25% per name
+RISK_DOLLARS = EQUITY * RISK_PCT                          # fixed for the run
+CAP_DOLLARS  = EQUITY * MAX_POS_PCT
 
 MIN_PRICE   = float(os.getenv("MIN_PRICE", "1.0"))       # skip sub-$1
 MIN_ADV_USD = float(os.getenv("MIN_ADV_USD", "300000"))  # 20d avg $ volume
 
+NOTES = "20d breakout & >50SMA & RSI(50-70); ATR stop x2; ~2R target"
 CSV_COLS = ["date","symbol","side","entry","stop","target","confidence","notes","shares"]
 OUT_MAIN = "signals.csv"
 OUT_BUYS = "buy_signals.csv"
+SIGNALS_DIR = os.getenv("SIGNALS_DIR", "signals")  # history: one {YYYY-MM-DD}.csv per day
+
+YF_BATCH   = 20  # max symbols per yf.download request
+YF_WORKERS = 4   # concurrent Yahoo requests within a batch; kept low for Yahoo's rate limit
+
+CACHE_DIR = os.getenv("OHLCV_CACHE_DIR", os.path.join(".cache", "ohlcv"))
+CACHE_STALE_DAYS = 7                             # older caches are refetched in full
+CACHE_RTOL = 1e-3                                # max relative drift of overlapping closes
+CACHE_ENABLED = bool(find_spec("pyarrow") or find_spec("fastparquet"))  # parquet needs an engine
+_OHLCV_CACHE: dict[str, pd.DataFrame] = {}       # per-process copy of the parquet cache
 
 DEFAULT_UNIVERSE = ["ABEO","CADL","CSAI","AZTR","IINN","ACTU","ESPR"]  # edit as you like
 
@@ -50,141 +86,293 @@ def load_universe():
             return [ln.strip().upper() for ln in f if ln.strip() and not ln.startswith("#")]
     return DEFAULT_UNIVERSE
 
-def rsi14(close: pd.Series) -> pd.Series:
-    delta = close.diff()
-    gain = delta.clip(lower=0.0)
-    loss = -delta.clip(upper=0.0)
-    roll_up = gain.rolling(14, min_periods=14).mean()
-    roll_dn = loss.rolling(14, min_periods=14).mean().replace(0, np.nan)
-    rs = roll_up / roll_dn
-    return 100 - (100 / (1 + rs))
-
-def atr14(df: pd.DataFrame) -> pd.Series:
-    h,l,c = df["High"], df["Low"], df["Close"]
-    tr = pd.concat([(h-l).abs(), (h-c.shift(1)).abs(), (l-c.shift(1)).abs()], axis=1).max(axis=1)
-    return tr.rolling(14, min_periods=14).mean()
-
-def passes_liquidity(df: pd.DataFrame) -> bool:
-    px = float(df["Close"].iloc[-1])
-    if px < MIN_PRICE:
-        return False
-    adv_usd = (df["Close"].tail(20) * df["Volume"].tail(20)).mean()
-    if pd.isna(adv_usd) or adv_usd < MIN_ADV_USD:
-        return False
-    return True
-
-def gap_spike_ok(df: pd.DataFrame) -> bool:
-    """True if NOT a +/-20% open gap spike."""
-    if len(df) < 2:
-        return True
-    prev_close = float(df["Close"].iloc[-2])
-    today_open = float(df["Open"].iloc[-1])
-    if prev_close <= 0:
-        return True
-    gap = abs(today_open/prev_close - 1.0)
-    return gap < 0.20
-
-def breakout_signal(df: pd.DataFrame) -> bool:
-    close = df["Close"]
-    if len(close) < 60:
-        return False
-    hi20 = close.rolling(20).max()
-    sma50 = close.rolling(50).mean()
-    rsi = rsi14(close)
-    last = close.index[-1]
-    cond_break = close.loc[last] >= (hi20.loc[last] - 1e-8)
-    cond_trend = close.loc[last] > sma50.loc[last]
-    val_rsi = rsi.loc[last]
-    cond_rsi = (not pd.isna(val_rsi)) and (50 <= val_rsi <= 70)
-    return bool(cond_break and cond_trend and cond_rsi)
-
-def size_shares(entry: float, stop: float) -> int:
-    if entry <= 0 or stop >= entry:
-        return 0
-    risk_dollars = EQUITY * RISK_PCT
-    stop_dist = entry - stop
-    if stop_dist <= 0:
-        return 0
-    by_risk = int(math.floor(risk_dollars / stop_dist))
-    by_cap  = int(math.floor((EQUITY * MAX_POS_PCT) / entry))
-    return max(0, min(by_risk, by_cap))
-
-def fetch_daily(sym: str) -> pd.DataFrame | None:
+@njit(cache=True, nogil=True)
+def wilder_rsi_atr(h, l, c, n=14):
+    """RSI(n) and ATR(n) with Wilder's smoothing in one pass over the bars.
+
+    Both averages are seeded with the simple mean of the first n values and then
+    follow avg = (prev*(n-1) + cur)/n. Bars before the seed are NaN.
+    """
+    m = c.shape[0]
+    rsi = np.full(m, np.nan)
+    atr = np.full(m, np.nan)
+    if m <= n:
+        return rsi, atr
+    avg_up = 0.0
+    avg_dn = 0.0
+    avg_tr = 0.0
+    for i in range(1, m):
+        d = c[i] - c[i-1]
+        up = d if d > 0.0 else 0.0
+        dn = -d if d < 0.0 else 0.0
+        tr = max(h[i] - l[i], abs(h[i] - c[i-1]), abs(l[i] - c[i-1]))
+        if i <= n:
+            avg_up += up / n
+            avg_dn += dn / n
+            avg_tr += tr / n
+            if i < n:
+                continue
+        else:
+            avg_up = (avg_up * (n - 1) + up) / n
+            avg_dn = (avg_dn * (n - 1) + dn) / n
+            avg_tr = (avg_tr * (n - 1) + tr) / n
+        rsi[i] = 100.0 if avg_dn == 0.0 else 100.0 - 100.0 / (1.0 + avg_up / avg_dn)
+        atr[i] = avg_tr
+    return rsi, atr
+
+def breakout_flags(closes: dict[str, np.ndarray]) -> dict[str, bool]:
+    """20-day-high and above-50-SMA test for the whole universe in one 2-D pass.
+
+    Each symbol's last 50 closes become one column of a (50, N) matrix, so the
+    reductions run once across all symbols. Symbols with < 60 bars are omitted.
+    """
+    syms = [s for s, c in closes.items() if len(c) >= 60]
+    if not syms:
+        return {}
+    mat = np.column_stack([closes[s][-50:] for s in syms])
+    last = mat[-1]
+    ok = (last >= mat[-20:].max(axis=0) - 1e-8) & (last > mat.mean(axis=0))
+    return dict(zip(syms, ok.tolist()))
+
+def screen(o: np.ndarray, c: np.ndarray, v: np.ndarray, val_rsi: float, breakout: bool) -> str | None:
+    """Liquidity, gap, breakout and RSI filters on open/close/volume arrays.
+
+    ``breakout`` comes from breakout_flags(). Returns the reason the symbol is
+    rejected, or None if it passes. Each filter only reduces the tail slice it needs.
+    """
+    px = c[-1]
+    adv_usd = (c[-20:] * v[-20:]).mean()                  # 20d avg $ volume
+    if px < MIN_PRICE or np.isnan(adv_usd) or adv_usd < MIN_ADV_USD:
+        return "liquidity/price filter failed"
+    prev_close = c[-2]
+    if prev_close > 0 and abs(o[-1]/prev_close - 1.0) >= 0.20:
+        return "open gap spike >= 20%"
+    cond_rsi = (not np.isnan(val_rsi)) and (50 <= val_rsi <= 70)
+    if not (breakout and cond_rsi):
+        return "no breakout setup"
+    return None
+
+def size_shares(entry: np.ndarray, stop: np.ndarray) -> np.ndarray:
+    """Shares for each entry/stop pair: risk budget / stop distance, capped by position value."""
+    entry = np.asarray(entry, np.float64)
+    stop_dist = entry - np.asarray(stop, np.float64)
+    ok = (entry > 0) & (stop_dist > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.minimum(RISK_DOLLARS // stop_dist, CAP_DOLLARS // entry)
+    return np.where(ok, shares, 0).astype(np.int64)
+
+def download_bars(syms: list[str], **window) -> dict[str, pd.DataFrame]:
+    """Batch-download daily bars; Yahoo accepts ~20 symbols per request.
+
+    ``window`` is passed to yf.download (``period=`` or ``start=``).
+    """
+    frames = []
+    chunks = [syms[i:i+YF_BATCH] for i in range(0, len(syms), YF_BATCH)]
+    # Chunks run one after another: yf.download keeps its results in module-level state, so
+    # concurrent calls would overwrite each other. Symbols within a chunk are fetched in parallel.
+    for chunk in chunks:
+        try:
+            data = yf.download(chunk, interval="1d", group_by="ticker",
+                               threads=YF_WORKERS, auto_adjust=False, progress=False, **window)
+        except Exception as e:
+            print(f"[WARN] download failed for {', '.join(chunk)}: {e}")
+            continue
+        if data is None or data.empty:
+            continue
+        if not isinstance(data.columns, pd.MultiIndex):
+            data = pd.concat({chunk[0]: data}, axis=1)   # single-ticker download has flat columns
+        frames.append(data)
+    if not frames:
+        return {}
+    data = pd.concat(frames, axis=1)
+
+    out = {}
+    for sym in syms:
+        try:
+            df = data[sym]
+        except KeyError:
+            continue
+        if any(col not in df.columns for col in ["Open","High","Low","Close","Volume"]):
+            continue
+        df = df.dropna()
+        if not df.empty:
+            out[sym] = df
+    return out
+
+def _cache_path(sym: str) -> str:
+    return os.path.join(CACHE_DIR, f"{sym}.parquet")
+
+def load_cached(sym: str) -> tuple[pd.DataFrame | None, pd.Timestamp | None]:
+    """Cached bars for sym and the date of the last one, or (None, None)."""
+    df = _OHLCV_CACHE.get(sym)
+    if df is None and os.path.exists(_cache_path(sym)):
+        try:
+            df = _OHLCV_CACHE[sym] = pd.read_parquet(_cache_path(sym))
+        except Exception:
+            return None, None
+    if df is None or df.empty:
+        return None, None
+    return df, df.index[-1]
+
+def save_cached(sym: str, df: pd.DataFrame) -> None:
+    _OHLCV_CACHE[sym] = df
     try:
-        df = yf.Ticker(sym).history(period="6mo", interval="1d", auto_adjust=False)
-        if df is None or df.empty:
-            return None
-        for col in ["Open","High","Low","Close","Volume"]:
-            if col not in df.columns:
-                return None
-        return df.dropna()
-    except Exception:
-        return None
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(_cache_path(sym))
+    except Exception as e:
+        print(f"[WARN] {sym}: could not write cache ({e})")
+
+def fetch_universe(universe: list[str]) -> dict[str, pd.DataFrame]:
+    """Daily bars for the universe, downloading only what the on-disk cache lacks.
+
+    Symbols with a fresh cache fetch the last few days and merge (a symbol whose
+    update fails is left out rather than served stale); missing or
+    stale (> CACHE_STALE_DAYS old) caches, and caches whose closes no longer
+    match the re-downloaded overlap (e.g. after a split), refetch the full 6 months.
+    """
+    if not CACHE_ENABLED:
+        print("[INFO] pyarrow not installed; OHLCV cache disabled, downloading full history")
+        return download_bars(universe, period="6mo")
+
+    today = pd.Timestamp(TODAY)
+    cached, warm, cold = {}, [], []
+    for sym in universe:
+        df, last = load_cached(sym)
+        if df is not None and (today - pd.Timestamp(last).tz_localize(None)).days <= CACHE_STALE_DAYS:
+            cached[sym] = df
+            warm.append(sym)
+        else:
+            cold.append(sym)
+
+    out, fresh = {}, {}
+    if warm:
+        start = min(cached[s].index[-1] for s in warm) - pd.Timedelta(days=5)
+        fresh = download_bars(warm, start=pd.Timestamp(start).strftime("%Y-%m-%d"))
+        for sym in warm:
+            if sym not in fresh:
+                # never trade off cached bars alone; they can be days old
+                print(f"[WARN] {sym}: update download failed; not using cached bars")
+                continue
+            # Yahoo rescales history after a split; if the overlapping closes moved, the cache is stale
+            overlap = cached[sym].index.intersection(fresh[sym].index)
+            if overlap.empty or not np.allclose(cached[sym].loc[overlap, "Close"].to_numpy(np.float64),
+                                                fresh[sym].loc[overlap, "Close"].to_numpy(np.float64),
+                                                rtol=CACHE_RTOL):
+                print(f"[INFO] {sym}: cached bars disagree with Yahoo (split?); refetching")
+                del fresh[sym]
+                cold.append(sym)
+                continue
+            df = pd.concat([cached[sym], fresh[sym]])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+            out[sym] = df[df.index >= df.index[-1] - pd.DateOffset(months=6)]
+    if cold:
+        out.update(download_bars(cold, period="6mo"))
+
+    for sym, df in out.items():
+        if sym in cold or sym in fresh:
+            save_cached(sym, df)
+    return out
+
+
+# ---------- Per-symbol evaluation ----------
+def to_arrays(df: pd.DataFrame) -> np.ndarray:
+    """(5, n) float64 array; each Open/High/Low/Close/Volume row is contiguous."""
+    return np.ascontiguousarray(df[["Open","High","Low","Close","Volume"]].to_numpy(np.float64).T)
+
+def evaluate(bars: np.ndarray | None, breakout: bool) -> tuple[float, float, float] | str:
+    """(entry, stop, target) for a BUY setup, or the reason the symbol is skipped.
+
+    Runs on worker threads, so it never prints; main() logs the results in universe order.
+    """
+    if bars is None or bars.shape[1] < 60:
+        return "insufficient data"
+    o, h, l, c, v = bars
+    rsi, atr = wilder_rsi_atr(h, l, c)
+    reason = screen(o, c, v, float(rsi[-1]), breakout)
+    if reason:
+        return reason
+
+    entry = float(c[-1])            # using close; you can switch to next open for live routing
+    atrv  = float(atr[-1])
+    if math.isnan(atrv) or atrv <= 0:
+        return "ATR invalid"
+
+    stop   = entry - 2.0 * atrv
+    target = entry + 4.0 * atrv
+    if round(stop, 2) >= entry:
+        return "stop >= entry"
+    return entry, stop, target
+
+
+# ---------- Output ----------
+def load_signal_history() -> pd.DataFrame:
+    """All past signals, concatenated from the per-day shards in SIGNALS_DIR."""
+    paths = sorted(glob.glob(os.path.join(SIGNALS_DIR, "*.csv")))
+    if not paths:
+        return pd.DataFrame(columns=CSV_COLS)
+    return pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+
+def _emit_signals_csv(rows: list[dict]) -> None:
+    # today's files are rewritten (always with a header); the router trades every row in signals.csv
+    for path in (OUT_BUYS, OUT_MAIN):
+        with open(path, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=CSV_COLS)
+            w.writeheader()
+            w.writerows(rows)
+    if rows:
+        print(f"[INFO] Wrote {len(rows)} rows to {OUT_BUYS} and {OUT_MAIN}")
+    else:
+        print("[INFO] No buys today. Wrote header-only buy_signals.csv and signals.csv")
+
+    # history is sharded per day, so a rerun only rewrites today's few rows (latest per symbol)
+    if not rows:
+        return
+    os.makedirs(SIGNALS_DIR, exist_ok=True)
+    shard = os.path.join(SIGNALS_DIR, f"{TODAY}.csv")
+    by_sym = {}
+    if os.path.exists(shard):
+        with open(shard, newline="") as f:
+            by_sym = {r["symbol"]: r for r in csv.DictReader(f)}
+    by_sym.update((r["symbol"], r) for r in rows)
+    with open(shard, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=CSV_COLS)
+        w.writeheader()
+        w.writerows(by_sym.values())
 
 
 # ---------- Main ----------
 def main():
     universe = load_universe()
     print(f"[INFO] Universe ({len(universe)}): {', '.join(universe)}")
-    rows = []
+    data = fetch_universe(universe)
+    bars = {sym: to_arrays(df) for sym, df in data.items()}
+    breakouts = breakout_flags({sym: b[3] for sym, b in bars.items()})
 
-    for sym in universe:
-        df = fetch_daily(sym)
-        if df is None or len(df) < 60:
-            print(f"[SKIP] {sym}: insufficient data")
-            continue
-        if not passes_liquidity(df):
-            print(f"[SKIP] {sym}: liquidity/price filter failed")
-            continue
-        if not gap_spike_ok(df):
-            print(f"[SKIP] {sym}: open gap spike >= 20%")
-            continue
-        if not breakout_signal(df):
-            print(f"[SKIP] {sym}: no breakout setup")
-            continue
+    # indicator math is NumPy and nogil Numba code that releases the GIL, so threads overlap it
+    items = [(bars.get(sym), breakouts.get(sym, False)) for sym in universe]
+    with ThreadPoolExecutor(max_workers=max(1, min(16, len(items)))) as ex:
+        results = list(ex.map(lambda args: evaluate(*args), items))
 
-        entry = float(df["Close"].iloc[-1])            # using close; you can switch to next open for live routing
-        atrv  = float(atr14(df).iloc[-1])
-        if math.isnan(atrv) or atrv <= 0:
-            print(f"[SKIP] {sym}: ATR invalid")
-            continue
+    # round and size every candidate in one vectorized pass
+    picks = [r for r in results if not isinstance(r, str)]
+    prices = np.round(np.array(picks, np.float64).reshape(-1, 3), 2)
+    shares = size_shares(prices[:, 0], prices[:, 1])
+    sized = iter(zip(prices.tolist(), shares.tolist()))
 
-        stop   = round(entry - 2.0 * atrv, 2)
-        target = round(entry + 4.0 * atrv, 2)
-        if stop >= entry:
-            print(f"[SKIP] {sym}: stop >= entry")
+    rows = []
+    for sym, res in zip(universe, results):
+        if isinstance(res, str):
+            print(f"[SKIP] {sym}: {res}")
             continue
-
-        shares = size_shares(entry, stop)
-        if shares < 1:
+        (entry, stop, target), n = next(sized)
+        if n < 1:
             print(f"[SKIP] {sym}: <1 share under risk/cap constraints")
             continue
+        rows.append({"date": TODAY, "symbol": sym, "side": "BUY", "entry": entry, "stop": stop,
+                     "target": target, "confidence": 0.60, "notes": NOTES, "shares": n})
+        print(f"[BUY ] {sym}: entry {entry} stop {stop} target {target} shares {n}")
 
-        notes = "20d breakout & >50SMA & RSI(50-70); ATR stop x2; ~2R target"
-        row = {
-            "date": TODAY,
-            "symbol": sym,
-            "side": "BUY",
-            "entry": round(entry, 2),
-            "stop": round(stop, 2),
-            "target": round(target, 2),
-            "confidence": 0.60,
-            "notes": notes,
-            "shares": shares,
-        }
-        rows.append(row)
-        print(f"[BUY ] {sym}: entry {row['entry']} stop {row['stop']} target {row['target']} shares {shares}")
-
-    # Write outputs (always create files with header)
-    out_df = pd.DataFrame(rows, columns=CSV_COLS)
-    if out_df.empty:
-        pd.DataFrame(columns=CSV_COLS).to_csv(OUT_BUYS, index=False)
-        pd.DataFrame(columns=CSV_COLS).to_csv(OUT_MAIN, index=False)
-        print("[INFO] No buys today. Wrote header-only buy_signals.csv and signals.csv")
-    else:
-        out_df.to_csv(OUT_BUYS, index=False)
-        out_df.to_csv(OUT_MAIN, index=False)
-        print(f"[INFO] Wrote {len(out_df)} rows to {OUT_BUYS} and {OUT_MAIN}")
+    _emit_signals_csv(rows)
 
 if __name__ == "__main__":
     # accept and ignore --headless for compatibility
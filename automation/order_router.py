@@ -2,7 +2,10 @@
 # Reads signals.csv and places bracket orders via Alpaca (PAPER by default).
 # Start on PAPER. Flip to live only after you're confident.
 
-import csv, os, math, time, uuid, sys, requests
+import asyncio, os, time, uuid, sys
+import httpx
+import numpy as np
+import pandas as pd
 
 ALPACA_KEY      = os.getenv("ALPACA_API_KEY", "")
 ALPACA_SECRET   = os.getenv("ALPACA_SECRET_KEY", "")
@@ -16,28 +19,56 @@ CSV_PATH        = os.getenv("SIGNALS_CSV", "signals.csv")
 ALLOW_SHORTS    = os.getenv("ALLOW_SHORTS", "false").lower() == "true"
 USE_LIMIT       = os.getenv("USE_LIMIT", "false").lower() == "true"
 TIME_IN_FORCE   = os.getenv("TIME_IN_FORCE", "day").lower()        # "day" or "gtc"
+SUBMIT_WORKERS  = 5                                                # max in-flight order posts
+NUM_COLS        = ["entry","stop","target"]
+SNAPSHOT_TTL    = 30                                               # seconds to reuse account/positions
 
 def H():
     return {"APCA-API-KEY-ID": ALPACA_KEY, "APCA-API-SECRET-KEY": ALPACA_SECRET}
 
-def _get(path):
-    return requests.get(ALPACA_BASE_URL + path, headers=H(), timeout=20)
-
-def _post(path, json):
-    return requests.post(ALPACA_BASE_URL + path, json=json, headers=H(), timeout=20)
-
-def get_equity():
+def _client():
+    # one HTTP/2 connection multiplexes every Alpaca call for the run
+    return httpx.AsyncClient(http2=True, base_url=ALPACA_BASE_URL, headers=H(), timeout=20,
+                             limits=httpx.Limits(max_connections=8))
+
+async def _get(client, path):
+    return await client.get(path)
+
+async def _post(client, path, json):
+    return await client.post(path, json=json)
+
+_SNAPSHOTS = {}  # time bucket -> task fetching (account, positions)
+
+async def _fetch_snapshot(client):
+    async def account():
+        if ACCOUNT_EQUITY:
+            return None
+        r = await _get(client, "/v2/account"); r.raise_for_status()
+        return r.json()
+    async def positions():
+        r = await _get(client, "/v2/positions")
+        return r.json() if r.is_success else []
+    return await asyncio.gather(account(), positions())
+
+async def _snapshot(client):
+    # account + positions fetched together; concurrent and repeat callers in a bucket share one fetch
+    bucket = int(time.time() // SNAPSHOT_TTL)
+    if bucket not in _SNAPSHOTS:
+        _SNAPSHOTS.clear()
+        _SNAPSHOTS[bucket] = asyncio.ensure_future(_fetch_snapshot(client))
+    return await _SNAPSHOTS[bucket]
+
+async def get_equity(client):
     if ACCOUNT_EQUITY:
         return float(ACCOUNT_EQUITY)
-    r = _get("/v2/account"); r.raise_for_status()
-    return float(r.json()["equity"])
+    account, _ = await _snapshot(client)
+    return float(account["equity"])
 
-def get_open_symbols():
-    r = _get("/v2/positions")
-    if not r.ok: return set()
-    return {p.get("symbol","").upper() for p in r.json()}
+async def get_open_symbols(client):
+    _, positions = await _snapshot(client)
+    return {p.get("symbol","").upper() for p in positions}
 
-def submit_bracket(symbol, qty, side, entry, stop, target, client_id):
+async def submit_bracket(client, symbol, qty, side, entry, stop, target, client_id):
     order = {
         "symbol": symbol,
         "qty": str(qty),
@@ -51,66 +82,92 @@ def submit_bracket(symbol, qty, side, entry, stop, target, client_id):
     }
     if USE_LIMIT:
         order["limit_price"] = round(float(entry), 4)
-    r = _post("/v2/orders", order)
-    if not r.ok:
+    r = await _post(client, "/v2/orders", order)
+    if not r.is_success:
         raise RuntimeError(f"{r.status_code} {r.text}")
     return r.json()
 
-def main():
+async def main():
     assert ALPACA_KEY and ALPACA_SECRET, "Missing Alpaca API credentials"
     if not os.path.exists(CSV_PATH):
         print(f"⚠ No {CSV_PATH}; nothing to trade."); return
 
-    with open(CSV_PATH, newline="") as f:
-        rows = list(csv.DictReader(f))
-    if not rows:
+    try:
+        df = pd.read_csv(CSV_PATH, dtype={"symbol": "string", "side": "string"})
+    except pd.errors.EmptyDataError:
+        df = pd.DataFrame()
+    if df.empty:
         print("⚠ signals.csv empty; nothing to trade."); return
-
-    equity = get_equity()
-    open_syms = get_open_symbols()
+    # absent columns behave like blank cells: no side means BUY, no prices means incomplete
+    missing = [c for c in NUM_COLS if c not in df.columns]
+    df = df.reindex(columns=["symbol","side"] + NUM_COLS).astype({"symbol": "string", "side": "string"})
+    df = df.fillna({"symbol": "", "side": "BUY"} | {c: 0.0 for c in missing})
+    df["symbol"] = df["symbol"].str.upper().str.strip()
+    df["side"] = df["side"].str.upper().str.strip().replace("", "BUY")
+    df[NUM_COLS] = df[NUM_COLS].apply(pd.to_numeric, errors="coerce").astype("float64")
+
+    async with _client() as client:
+        await route(client, df)
+
+async def route(client, df):
+    equity, open_syms = await asyncio.gather(get_equity(client), get_open_symbols(client))
     print(f"Equity: ${equity:,.2f} | Open names: {len(open_syms)}")
 
-    placed = []
-    for r in rows:
-        sym  = (r.get("symbol") or "").upper().strip()
-        side = (r.get("side") or "BUY").upper().strip()
-        try:
-            entry  = float(r.get("entry", 0))
-            stop   = float(r.get("stop", 0))
-            target = float(r.get("target", 0))
-        except Exception:
-            print(f"⚠ Bad numeric values for {sym}, skip."); continue
-
-        if not sym or entry <= 0 or stop <= 0 or target <= 0:
-            print(f"⚠ Incomplete signal for {sym}, skip."); continue
-        if side not in ("BUY","SELL"):
-            print(f"⚠ Invalid side {side} for {sym}, skip."); continue
-        if side == "SELL" and not ALLOW_SHORTS:
-            print(f"ℹ Skip short {sym} (ALLOW_SHORTS=false)."); continue
-        if sym in open_syms:
-            print(f"ℹ Already open {sym}, skip."); continue
-        if len(open_syms) >= MAX_OPEN_NAMES:
+    # validate every row with boolean masks; rejects are reported by the first check they fail
+    df["risk"] = np.where(df["side"] == "BUY", df["entry"] - df["stop"], df["stop"] - df["entry"])
+    checks = [
+        (df[NUM_COLS].notna().all(axis=1),                   "⚠ Bad numeric values for {symbol}, skip."),
+        ((df["symbol"] != "") & (df[NUM_COLS] > 0).all(axis=1), "⚠ Incomplete signal for {symbol}, skip."),
+        (df["side"].isin(["BUY","SELL"]),                    "⚠ Invalid side {side} for {symbol}, skip."),
+        ((df["side"] != "SELL") | ALLOW_SHORTS,              "ℹ Skip short {symbol} (ALLOW_SHORTS=false)."),
+        (~df["symbol"].isin(open_syms),                      "ℹ Already open {symbol}, skip."),
+        (df["risk"] > 0,                                     "⚠ Non-positive risk for {symbol}, skip."),
+    ]
+    valid = pd.Series(True, index=df.index)
+    for ok, msg in checks:
+        for r in df.loc[valid & ~ok].itertuples(index=False):
+            print(msg.format(**r._asdict()))
+        valid &= ok
+    dup = valid & df["symbol"].where(valid).duplicated()
+    for sym in df.loc[dup, "symbol"]:
+        print(f"ℹ Already open {sym}, skip.")
+    df = df.loc[valid & ~dup].copy()
+
+    # equity is fixed for the run, so size every surviving row in one pass
+    risk_dollars = RISK_PCT * equity
+    cap_dollars = MAX_POS_PCT * equity
+    qty_risk = np.floor_divide(risk_dollars, df["risk"].to_numpy()).astype(np.int64)
+    qty_cap = np.floor_divide(cap_dollars, df["entry"].to_numpy()).astype(np.int64)
+    df["qty"] = np.clip(np.minimum(qty_risk, qty_cap), 0, None)
+    for sym in df.loc[df["qty"] <= 0, "symbol"]:
+        print(f"⚠ {sym} sized to 0 by caps; skip.")
+    df = df.loc[df["qty"] > 0]
+
+    queue = []
+    for r in df.itertuples(index=False):
+        if len(open_syms) + len(queue) >= MAX_OPEN_NAMES:
             print("ℹ Max open names reached; stop queueing."); break
 
-        per_share_risk = entry - stop if side=="BUY" else stop - entry
-        if per_share_risk <= 0:
-            print(f"⚠ Non-positive risk for {sym}, skip."); continue
-
-        risk_dollars = RISK_PCT * equity
-        qty = math.floor(max(0, risk_dollars / per_share_risk))
-        max_qty_by_value = math.floor((MAX_POS_PCT * equity) / entry)
-        qty = max(0, min(qty, max_qty_by_value))
-        if qty == 0:
-            print(f"⚠ {sym} sized to 0 by caps; skip."); continue
-
-        client_id = f"sig-{sym}-{int(time.time())}-{uuid.uuid4().hex[:6]}"
-        try:
-            resp = submit_bracket(sym, qty, "buy" if side=="BUY" else "sell", entry, stop, target, client_id)
-            placed.append((sym, qty, side, resp.get("id")))
-            open_syms.add(sym)
-            print(f"✅ Placed {side} {qty} {sym} @~{entry} | SL {stop} / TP {target}")
-        except Exception as e:
-            print(f"❌ Order failed {sym}: {e}")
+        qty = r.qty
+        client_id = f"sig-{r.symbol}-{int(time.time())}-{uuid.uuid4().hex[:6]}"
+        queue.append(dict(symbol=r.symbol, qty=qty, side=r.side.lower(),
+                          entry=r.entry, stop=r.stop, target=r.target, client_id=client_id))
+
+    # order posts are network-bound; run them as concurrent coroutines
+    sem = asyncio.Semaphore(SUBMIT_WORKERS)
+    async def submit(kw):
+        async with sem:
+            return await submit_bracket(client, **kw)
+    results = await asyncio.gather(*[submit(kw) for kw in queue], return_exceptions=True)
+
+    placed = []
+    for kw, resp in zip(queue, results):
+        sym, qty, side = kw["symbol"], kw["qty"], kw["side"].upper()
+        if isinstance(resp, Exception):
+            print(f"❌ Order failed {sym}: {resp}"); continue
+        placed.append((sym, qty, side, resp.get("id")))
+        open_syms.add(sym)
+        print(f"✅ Placed {side} {qty} {sym} @~{kw['entry']} | SL {kw['stop']} / TP {kw['target']}")
 
     if not placed:
         print("ℹ No orders placed.")
@@ -121,6 +178,6 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except Exception as e:
         print("❌ Fatal:", e); sys.exit(1)